@@ -25,6 +25,11 @@ class ImageGenerator {
     this.outputDir = path.join(__dirname, '../generated_outfits');
     
     this.isAvailable = null; // Cache availability status
+
+    // Persistent Python worker, started on first use
+    this.worker = null;
+    this.pendingRequests = new Map();
+    this.nextRequestId = 1;
   }
 
   /**
@@ -178,53 +183,141 @@ class ImageGenerator {
   }
 
   /**
-   * Run Python script for image generation
+   * Run a command through the persistent Python worker
    * @param {string} command - Command to run (test_availability, generate)
    * @param {Object} params - Parameters for the command
    * @returns {Promise<Object>} Script result
    */
   async runPythonScript(command, params = {}) {
+    const worker = this.startWorker();
+    const id = this.nextRequestId++;
+
     return new Promise((resolve, reject) => {
-      const args = [this.generatorScript, command];
-      
-      // Add parameters as JSON string
-      if (Object.keys(params).length > 0) {
-        args.push(JSON.stringify(params));
-      }
-      
-      const pythonProcess = spawn(this.pythonPath, args, {
-        stdio: ['pipe', 'pipe', 'pipe']
-      });
-      
-      let stdout = '';
-      let stderr = '';
-      
-      pythonProcess.stdout.on('data', (data) => {
-        stdout += data.toString();
-      });
-      
-      pythonProcess.stderr.on('data', (data) => {
-        stderr += data.toString();
-      });
-      
-      pythonProcess.on('close', (code) => {
-        if (code === 0) {
-          try {
-            // Parse JSON response from Python script
-            const result = JSON.parse(stdout.trim());
-            resolve(result);
-          } catch (parseError) {
-            reject(new Error(`Failed to parse Python script output: ${stdout}`));
-          }
-        } else {
-          reject(new Error(`Python script failed with code ${code}: ${stderr}`));
+      this.pendingRequests.set(id, { resolve, reject });
+      this.updateWorkerRef();
+      worker.stdin.write(JSON.stringify({ id, command, params }) + '\n');
+    });
+  }
+
+  /**
+   * Start the Python worker if it is not already running.
+   * The worker keeps the diffusers pipeline loaded between requests.
+   * @returns {ChildProcess} Running worker process
+   */
+  startWorker() {
+    if (this.worker) {
+      return this.worker;
+    }
+
+    const worker = spawn(this.pythonPath, [this.generatorScript, 'serve'], {
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+
+    let stdoutBuffer = '';
+    let stderr = '';
+
+    worker.stdout.on('data', (data) => {
+      stdoutBuffer += data.toString();
+
+      // The worker answers with one JSON object per line
+      let newlineIndex;
+      while ((newlineIndex = stdoutBuffer.indexOf('\n')) !== -1) {
+        const line = stdoutBuffer.slice(0, newlineIndex).trim();
+        stdoutBuffer = stdoutBuffer.slice(newlineIndex + 1);
+        if (line) {
+          this.handleWorkerLine(line);
         }
-      });
-      
-      pythonProcess.on('error', (error) => {
-        reject(new Error(`Failed to start Python script: ${error.message}`));
-      });
+      }
+    });
+
+    worker.stderr.on('data', (data) => {
+      // Keep only the tail, diffusers progress bars are chatty
+      stderr = (stderr + data.toString()).slice(-4000);
+    });
+
+    // Writing to a worker that already exited fails with EPIPE
+    worker.stdin.on('error', (error) => {
+      this.failPendingRequests(new Error(`Python worker stdin failed: ${error.message}`));
+    });
+
+    worker.on('close', (code) => {
+      this.failPendingRequests(new Error(`Python worker exited with code ${code}: ${stderr}`));
+      if (this.worker === worker) {
+        this.worker = null;
+      }
     });
+
+    worker.on('error', (error) => {
+      this.failPendingRequests(new Error(`Failed to start Python worker: ${error.message}`));
+      if (this.worker === worker) {
+        this.worker = null;
+      }
+    });
+
+    this.worker = worker;
+    this.updateWorkerRef();
+    return worker;
+  }
+
+  /**
+   * Only let the worker keep Node alive while requests are in flight,
+   * so callers exit once their last generation resolves
+   */
+  updateWorkerRef() {
+    if (!this.worker) {
+      return;
+    }
+
+    const method = this.pendingRequests.size > 0 ? 'ref' : 'unref';
+    for (const handle of [this.worker, this.worker.stdin, this.worker.stdout, this.worker.stderr]) {
+      handle?.[method]?.();
+    }
+  }
+
+  /**
+   * Resolve the pending request matching a worker response line
+   * @param {string} line - One line of worker stdout
+   */
+  handleWorkerLine(line) {
+    let result;
+    try {
+      result = JSON.parse(line);
+    } catch (parseError) {
+      console.warn(`⚠️ Unexpected Python worker output: ${line}`);
+      return;
+    }
+
+    const pending = this.pendingRequests.get(result.id);
+    if (!pending) {
+      return;
+    }
+
+    this.pendingRequests.delete(result.id);
+    this.updateWorkerRef();
+    delete result.id;
+    pending.resolve(result);
+  }
+
+  /**
+   * Reject every request still waiting on the worker
+   * @param {Error} error - Reason for the failure
+   */
+  failPendingRequests(error) {
+    for (const { reject } of this.pendingRequests.values()) {
+      reject(error);
+    }
+    this.pendingRequests.clear();
+    this.updateWorkerRef();
+  }
+
+  /**
+   * Stop the Python worker and release the loaded pipeline
+   */
+  shutdown() {
+    if (this.worker) {
+      this.worker.stdin.end();
+      this.worker = null;
+    }
   }
 
   /**
@@ -344,6 +344,13 @@ class PhotoRealisticVisualizer {
       return this.initialize();
     }
   }
+
+  /**
+   * Stop the Python worker kept alive by the image generator
+   */
+  shutdown() {
+    this.imageGenerator.shutdown();
+  }
 }
 
 module.exports = PhotoRealisticVisualizer;
\ No newline at end of file
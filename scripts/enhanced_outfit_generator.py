@@ -9,10 +9,18 @@ import sys
 import json
 import os
 import time
-import psutil
+import queue
+import random
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import argparse
+import atexit
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from functools import lru_cache, partial
 
 # Check for required packages
 try:
@@ -22,24 +30,285 @@ try:
         StableDiffusionPipeline,
         DPMSolverMultistepScheduler,
         DDIMScheduler,
-        EulerAncestralDiscreteScheduler
+        EulerAncestralDiscreteScheduler,
+        EulerDiscreteScheduler
     )
     from PIL import Image
     import numpy as np
+    from safetensors.torch import load_file
 except ImportError as e:
     print(f"Error: Missing required package - {e}")
     print("Please install: pip install torch diffusers pillow numpy")
     sys.exit(1)
 
+# Optional feature caching across denoising steps
+try:
+    from DeepCache import DeepCacheSDHelper
+    DEEPCACHE_AVAILABLE = True
+except ImportError:
+    DEEPCACHE_AVAILABLE = False
+
+try:
+    import xformers  # noqa: F401
+    XFORMERS_AVAILABLE = True
+except ImportError:
+    XFORMERS_AVAILABLE = False
+
+# Rough peak activation memory per 1024x1024 image with classifier-free guidance
+ACTIVATION_GB_PER_MEGAPIXEL = 1.5
+
+# Pinned host memory held at once while copying swapped UNet weights to the GPU
+SWAP_STAGING_BYTES = 512 * 1024 * 1024
+
+# Server mode collects requests for this long before running a batch
+SERVE_BATCH_WINDOW = 0.2
+
+# Number of encoded prompt pairs kept for reuse
+PROMPT_CACHE_SIZE = 32
+
+# Approximate latent cache: resume prompts that are at least this similar to a cached one
+LATENT_CACHE_SIMILARITY = 0.92
+LATENT_CACHE_RESUME_FRACTION = 0.4
+LATENT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Explicitly seeded requests only share cached latents within a seed bucket, so a
+# reused start stays close to what the requested seed would have produced
+LATENT_CACHE_SEED_BUCKET = 16
+# Index and embedding writes are batched to at most one per interval
+LATENT_CACHE_FLUSH_SECONDS = 30
+
+# Background PNG encoding so the next generation doesn't wait on zlib
+_IO_POOL = ThreadPoolExecutor(max_workers=2)
+_OUTPUT_LOCK = threading.Lock()
+
+# Startup cache of the model scan (invalidated by models_dir mtime) and system info
+MODELS_CACHE_FILE = ".cache.json"
+SYSTEM_INFO_TTL = 60
+
+# Preset keys that configure the generator rather than the diffusers pipeline call
+GENERATOR_ONLY_PARAMS = {"cache_interval"}
+
+def _pipeline_kwargs(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip generator-only keys from preset parameters"""
+    return {k: v for k, v in params.items() if k not in GENERATOR_ONLY_PARAMS}
+
+def _is_out_of_memory(error: Exception) -> bool:
+    """Check whether an exception is a CUDA or MPS out-of-memory error"""
+    if isinstance(error, torch.cuda.OutOfMemoryError):
+        return True
+    return isinstance(error, RuntimeError) and "out of memory" in str(error).lower()
+
+@lru_cache(maxsize=1)
+def _total_ram_gb() -> float:
+    """Total physical memory, read from /proc/meminfo or sysconf without psutil"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) / (1024**2)
+    except OSError:
+        pass
+    
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024**3)
+
+def _prompt_embedding(embeds: Dict[str, Any]) -> Any:
+    """Single vector describing a prompt, used for similarity lookups"""
+    if "pooled_prompt_embeds" in embeds:
+        vector = embeds["pooled_prompt_embeds"]
+    else:
+        vector = embeds["prompt_embeds"].mean(dim=1)
+    return vector.flatten().float().cpu()
+
+def _save_png(image: Any, output_path: str) -> None:
+    """Write a PNG atomically, so concurrent saves to one path never leave a torn file"""
+    temp_path = f"{output_path}.{threading.get_ident()}.tmp"
+    image.save(temp_path, "PNG", compress_level=3)
+    os.replace(temp_path, output_path)
+
+@contextmanager
+def _skip_first_steps(scheduler: Any, skip_steps: int):
+    """Drop the first `skip_steps` timesteps whenever the scheduler sets its schedule"""
+    if skip_steps == 0:
+        yield
+        return
+    
+    original_set_timesteps = scheduler.set_timesteps
+    
+    def set_timesteps(*args, **kwargs):
+        original_set_timesteps(*args, **kwargs)
+        scheduler.timesteps = scheduler.timesteps[skip_steps:]
+        if hasattr(scheduler, "sigmas"):
+            scheduler.sigmas = scheduler.sigmas[skip_steps:]
+    
+    scheduler.set_timesteps = set_timesteps
+    try:
+        yield
+    finally:
+        del scheduler.set_timesteps
+
+class LatentCache:
+    """Disk-backed cache of partially denoised latents, reused across similar prompts.
+    
+    Entries are grouped by a scope string (model, preset, shape, steps, negative
+    prompt, seed bucket) and matched by cosine similarity of prompt embeddings.
+    When full, the entry with the largest size / (hits * steps saved) is evicted
+    first. Embeddings live in one tensor file next to a small JSON index, and both
+    are written at most every LATENT_CACHE_FLUSH_SECONDS and at exit.
+    """
+    
+    def __init__(self, cache_dir: Path, max_bytes: int = LATENT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.index_path = cache_dir / "index.json"
+        self.embeddings_path = cache_dir / "embeddings.pt"
+        self.max_bytes = max_bytes
+        self.entries, self.embeddings = self._load_index()
+        
+        # Stacked embeddings per scope, rebuilt after entries change
+        self._scope_matrices: Dict[str, Tuple[List[str], Any]] = {}
+        self._dirty = False
+        self._last_flush = time.time()
+        atexit.register(self.flush)
+    
+    def _load_index(self) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """Read the cache index and embeddings, starting empty if either is missing or corrupt"""
+        try:
+            with open(self.index_path) as f:
+                entries = json.load(f)
+            embeddings = torch.load(self.embeddings_path, map_location="cpu", weights_only=True)
+        except (OSError, ValueError, RuntimeError):
+            return {}, {}
+        
+        # Entries without an embedding can never match
+        entries = {key: entry for key, entry in entries.items() if key in embeddings}
+        return entries, {key: embeddings[key] for key in entries}
+    
+    def flush(self) -> None:
+        """Persist the index and embeddings if they changed"""
+        if not self._dirty:
+            return
+        
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        torch.save(self.embeddings, self.embeddings_path)
+        with open(self.index_path, "w") as f:
+            json.dump(self.entries, f)
+        self._dirty = False
+        self._last_flush = time.time()
+    
+    def _changed(self) -> None:
+        """Mark the index dirty, writing it if the last write is old enough"""
+        self._dirty = True
+        if time.time() - self._last_flush >= LATENT_CACHE_FLUSH_SECONDS:
+            self.flush()
+    
+    def _scope_matrix(self, scope: str) -> Tuple[List[str], Any]:
+        """Keys and stacked embeddings of every entry in `scope`"""
+        if scope not in self._scope_matrices:
+            keys = [key for key, entry in self.entries.items() if entry["scope"] == scope]
+            matrix = torch.stack([self.embeddings[key] for key in keys]) if keys else None
+            self._scope_matrices[scope] = (keys, matrix)
+        return self._scope_matrices[scope]
+    
+    def lookup(self, scope: str, embedding: Any) -> Optional[Tuple[Any, int]]:
+        """Return (latents, completed_steps) of the most similar cached prompt, if close enough"""
+        keys, matrix = self._scope_matrix(scope)
+        if not keys:
+            return None
+        
+        similarities = torch.nn.functional.cosine_similarity(matrix, embedding.unsqueeze(0), dim=1)
+        best_similarity, best_index = similarities.max(dim=0)
+        best_similarity = best_similarity.item()
+        if best_similarity < LATENT_CACHE_SIMILARITY:
+            return None
+        
+        best_key = keys[best_index.item()]
+        entry = self.entries[best_key]
+        try:
+            latents = torch.load(self.cache_dir / f"{best_key}.pt", map_location="cpu", weights_only=True)
+        except (OSError, RuntimeError):
+            self._remove(best_key)
+            self._changed()
+            return None
+        
+        entry["hits"] += 1
+        self._changed()
+        print(f"♻️  Resuming from cached latents (similarity {best_similarity:.3f}, step {entry['step']})")
+        return latents, entry["step"]
+    
+    def store(self, scope: str, prompt: str, embedding: Any, latents: Any, step: int) -> None:
+        """Save the latents reached after `step` denoising steps for this prompt"""
+        key = hashlib.sha256(f"{scope}|{prompt}".encode()).hexdigest()[:16]
+        path = self.cache_dir / f"{key}.pt"
+        
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        torch.save(latents.cpu(), path)
+        
+        self.entries[key] = {
+            "scope": scope,
+            "prompt": prompt[:200],
+            "step": step,
+            "size": path.stat().st_size,
+            "hits": 0
+        }
+        self.embeddings[key] = embedding.clone()
+        self._scope_matrices.pop(scope, None)
+        self._evict()
+        self._changed()
+    
+    def _evict(self) -> None:
+        """Drop entries until the cache fits, least valuable bytes first"""
+        def cost(key: str) -> float:
+            entry = self.entries[key]
+            return entry["size"] / ((entry["hits"] + 1) * entry["step"])
+        
+        total = sum(entry["size"] for entry in self.entries.values())
+        while self.entries and total > self.max_bytes:
+            key = max(self.entries, key=cost)
+            total -= self.entries[key]["size"]
+            self._remove(key)
+    
+    def _remove(self, key: str) -> None:
+        """Delete an entry and its latents file"""
+        entry = self.entries.pop(key, None)
+        self.embeddings.pop(key, None)
+        if entry is not None:
+            self._scope_matrices.pop(entry["scope"], None)
+        try:
+            (self.cache_dir / f"{key}.pt").unlink()
+        except FileNotFoundError:
+            pass
+
+# Pipeline classes by name, for restoring cached model entries
+PIPELINE_CLASSES = {
+    cls.__name__: cls for cls in (StableDiffusionXLPipeline, StableDiffusionPipeline)
+}
+
 class ModelManager:
     """Manages model loading and selection based on system capabilities"""
     
-    def __init__(self, models_dir: str):
+    def __init__(self, models_dir: str, quantize: bool = False):
         self.models_dir = Path(models_dir)
+        self.quantize = quantize
         self.device = self._detect_device()
-        self.system_info = self._get_system_info()
+        self.torch_dtype = self._select_dtype()
+        self.system_info = self._get_system_info_cached()
         self.loaded_pipeline = None
         self.current_model = None
+        self.compiled = False
+        self.offloaded = False
+        self.quantized = False
+        self.xformers_enabled = False
+        self.qkv_fused = False
+        self.cache_helper = None
+        self.cache_enabled = False
+        self.base_scheduler_config = None
+        self.scheduler_model = None
+        
+        # (width, height, batch) shapes the compiled UNet has already been traced for
+        self.compiled_shapes = set()
+        
+        # Persist Inductor kernels next to the models so restarts skip recompilation
+        os.environ.setdefault(
+            "TORCHINDUCTOR_CACHE_DIR", str(self.models_dir / ".inductor_cache")
+        )
         
     def _detect_device(self) -> str:
         """Detect optimal device for generation"""
@@ -50,9 +319,19 @@ class ModelManager:
         else:
             return "cpu"
     
+    def _select_dtype(self) -> Any:
+        """Pick the compute dtype: bf16 on Ampere+ CUDA, fp16 on MPS/older CUDA, fp32 on CPU"""
+        # is_bf16_supported() also reports emulated bf16 on pre-Ampere GPUs, which is slow
+        if self.device == "cuda" and torch.cuda.get_device_capability() >= (8, 0):
+            return torch.bfloat16
+        elif self.device != "cpu":
+            return torch.float16
+        else:
+            return torch.float32
+    
     def _get_system_info(self) -> Dict[str, Any]:
         """Get detailed system information"""
-        ram_gb = psutil.virtual_memory().total / (1024**3)
+        ram_gb = _total_ram_gb()
         
         if self.device == "mps":
             # Apple Silicon - estimate VRAM as portion of unified memory
@@ -69,10 +348,81 @@ class ModelManager:
             "torch_version": torch.__version__
         }
     
+    def _get_system_info_cached(self) -> Dict[str, Any]:
+        """System info, reused from the startup cache for up to SYSTEM_INFO_TTL seconds"""
+        cache = self._read_cache()
+        cached = cache.get("system_info")
+        if (cached and cached["info"].get("device") == self.device and
+                time.time() - cached["timestamp"] < SYSTEM_INFO_TTL):
+            return cached["info"]
+        
+        info = self._get_system_info()
+        cache["system_info"] = {"timestamp": time.time(), "info": info}
+        self._write_cache(cache)
+        return info
+    
+    def _scan_available_models_cached(self) -> Dict[str, Dict[str, Any]]:
+        """Available models, rescanned only when the models directory changes"""
+        cache_path = self.models_dir / MODELS_CACHE_FILE
+        try:
+            # Create the cache file first so its creation doesn't change the mtime we record
+            cache_path.touch(exist_ok=True)
+            mtime_ns = os.stat(self.models_dir).st_mtime_ns
+        except OSError:
+            return self._scan_available_models()
+        
+        cache = self._read_cache()
+        cached = cache.get("models")
+        if cached and cached["mtime_ns"] == mtime_ns:
+            try:
+                return {
+                    name: {
+                        **info,
+                        "path": Path(info["path"]),
+                        "pipeline_class": PIPELINE_CLASSES[info["pipeline_class"]]
+                    }
+                    for name, info in cached["models"].items()
+                }
+            except (KeyError, TypeError):
+                pass
+        
+        models = self._scan_available_models()
+        cache["models"] = {
+            "mtime_ns": mtime_ns,
+            "models": {
+                name: {
+                    **info,
+                    "path": str(info["path"]),
+                    "pipeline_class": info["pipeline_class"].__name__
+                }
+                for name, info in models.items()
+            }
+        }
+        self._write_cache(cache)
+        return models
+    
+    def _read_cache(self) -> Dict[str, Any]:
+        """Read the startup cache, starting empty if it is missing or corrupt"""
+        try:
+            with open(self.models_dir / MODELS_CACHE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_cache(self, cache: Dict[str, Any]) -> None:
+        """Write the startup cache in place; a missing models directory is not an error"""
+        if not self.models_dir.is_dir():
+            return
+        try:
+            with open(self.models_dir / MODELS_CACHE_FILE, "w") as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            print(f"⚠️ Could not write model cache: {e}")
+    
     def get_optimal_model(self, quality_preset: str = "high_quality") -> Dict[str, Any]:
         """Select optimal model based on system capabilities and quality preset"""
         
-        available_models = self._scan_available_models()
+        available_models = self._scan_available_models_cached()
         vram_gb = self.system_info["vram_gb"]
         
         # Model selection logic
@@ -146,31 +496,88 @@ class ModelManager:
         """Load and optimize the diffusion pipeline"""
         print(f"🔄 Loading {model_info['type']} model from {model_info['path']}")
         
+        # Cached features belong to the previous UNet
+        self.disable_feature_cache()
+        
+        # Release the previous model so free VRAM is measured accurately
+        self.loaded_pipeline = None
+        self.current_model = None
+        
+        # Compiled graphs and their CUDA-graph pools still reference the old UNet
+        if self.compiled:
+            torch._dynamo.reset()
+            self.compiled = False
+            self.compiled_shapes = set()
+        self.free_memory()
+        
         try:
+            self.offloaded = False
+            self.quantized = False
+            self.xformers_enabled = False
+            self.qkv_fused = False
+            
             # Load pipeline
             pipeline_class = model_info["pipeline_class"]
+            load_kwargs = {}
+            if pipeline_class is StableDiffusionPipeline:
+                # Skip the CLIP safety checker forward on every SD1.5 output
+                load_kwargs = {
+                    "safety_checker": None,
+                    "requires_safety_checker": False,
+                    "feature_extractor": None
+                }
+            
             pipeline = pipeline_class.from_pretrained(
                 str(model_info["path"]),
-                torch_dtype=torch.float16 if self.device != "cpu" else torch.float32,
+                torch_dtype=self.torch_dtype,
                 variant="fp16" if self.device != "cpu" else None,
-                use_safetensors=True
+                use_safetensors=True,
+                **load_kwargs
             )
             
+            # tqdm output is noise when stdout is piped to Node.js
+            pipeline.set_progress_bar_config(disable=True)
+            
             # Optimize for device
             if self.device == "mps":
+                # PyTorch 2 SDPA is the default attention processor on MPS
                 pipeline = pipeline.to("mps")
-                # Enable memory efficient attention for MPS
-                pipeline.enable_attention_slicing()
             elif self.device == "cuda":
-                pipeline = pipeline.to("cuda")
-                # Enable memory optimizations
-                pipeline.enable_attention_slicing()
-                pipeline.enable_model_cpu_offload()
+                # NHWC layout selects the faster cuDNN convolution kernels
+                pipeline.unet.to(memory_format=torch.channels_last)
+                pipeline.vae.to(memory_format=torch.channels_last)
+                
+                # Only trade speed for memory when the model doesn't fit
+                free_bytes, _ = torch.cuda.mem_get_info()
+                free_gb = free_bytes / (1024**3)
+                if free_gb < model_info["vram_required"] + 2:
+                    print(f"💾 Only {free_gb:.1f}GB VRAM free - enabling CPU offload")
+                    pipeline = self._enable_offload(pipeline)
+                    self.offloaded = True
+                else:
+                    pipeline = pipeline.to("cuda")
+                self._set_attention_processor(pipeline)
             else:
                 pipeline = pipeline.to("cpu")
             
-            # Set optimal scheduler
-            self._set_optimal_scheduler(pipeline, model_info["type"])
+            # Keep the checkpoint's own scheduler config to derive optimal schedulers from
+            self.base_scheduler_config = pipeline.scheduler.config
+            self.scheduler_model = None
+            
+            # Quantize before compiling so the compiled graph uses the int8 kernels
+            if self.quantize:
+                self._quantize_unet(pipeline)
+            
+            # Compile the denoising hot path (MPS is not supported by Inductor,
+            # and offload hooks move weights between devices on every call)
+            if self.device == "cuda" and not self.offloaded:
+                self._compile_pipeline(pipeline)
+            
+            # Reuse high-level UNet features across denoising steps. DeepCache
+            # rewrites block forwards and keeps cached tensors between steps,
+            # which breaks the compiled graph and its CUDA-graph memory pool
+            if DEEPCACHE_AVAILABLE and not self.compiled:
+                self.cache_helper = DeepCacheSDHelper(pipe=pipeline)
             
             # Enable memory optimizations
             if hasattr(pipeline, 'enable_vae_slicing'):
@@ -186,19 +593,389 @@ class ModelManager:
             print(f"❌ Failed to load model: {e}")
             raise
     
-    def _set_optimal_scheduler(self, pipeline: Any, model_type: str) -> None:
+    def reconfigure_for_preset(
+        self,
+        pipeline: Any,
+        model_info: Dict[str, Any],
+        params: Dict[str, Any]
+    ) -> None:
+        """Adapt the loaded pipeline to a model and preset without reloading weights"""
+        if self.scheduler_model != model_info["path"]:
+            self._set_optimal_scheduler(pipeline, model_info)
+            self.scheduler_model = model_info["path"]
+        
+        # Decode large outputs in tiles to cap the VAE memory spike
+        if hasattr(pipeline, "vae"):
+            if params["width"] * params["height"] >= 1024 * 1024:
+                pipeline.vae.enable_tiling()
+            else:
+                pipeline.vae.disable_tiling()
+        
+        self.set_feature_cache_interval(params["cache_interval"])
+    
+    def track_compiled_shape(self, width: int, height: int, batch: int, guidance_scale: float) -> None:
+        """Note a UNet input shape, announcing the one-off compile for new ones.
+        
+        Classifier-free guidance doubles the UNet batch, so it is part of the shape.
+        """
+        if not self.compiled:
+            return
+        
+        shape = (width, height, batch, guidance_scale > 1.0)
+        if shape not in self.compiled_shapes:
+            print(f"⏳ First run at {width}x{height} batch {batch} - compiling UNet")
+            self.compiled_shapes.add(shape)
+    
+    def _enable_offload(self, pipeline: Any) -> Any:
+        """Stream UNet blocks from CPU, overlapping each transfer with the previous block's compute.
+        
+        Everything else stays resident: the VAE is small, and the text encoders
+        run once per prompt thanks to the prompt embedding cache.
+        """
+        try:
+            from diffusers.hooks import apply_group_offloading
+        except ImportError:
+            # Older diffusers: whole-model offload, synchronous transfers
+            pipeline.enable_model_cpu_offload()
+            return pipeline
+        
+        apply_group_offloading(
+            pipeline.unet,
+            onload_device=torch.device("cuda"),
+            offload_device=torch.device("cpu"),
+            offload_type="block_level",
+            num_blocks_per_group=2,
+            use_stream=True
+        )
+        
+        for name, component in pipeline.components.items():
+            if name != "unet" and isinstance(component, torch.nn.Module):
+                component.to("cuda")
+        
+        return pipeline
+    
+    def can_swap_unet(self, model_info: Dict[str, Any]) -> bool:
+        """Check whether switching to `model_info` only needs new UNet weights"""
+        return (
+            self.loaded_pipeline is not None and
+            not self.offloaded and
+            not self.quantized and
+            self.current_model["type"] == "sdxl" and
+            model_info["type"] == "sdxl" and
+            self._unet_weights_path(model_info["path"]) is not None
+        )
+    
+    def swap_unet(self, model_info: Dict[str, Any]) -> Any:
+        """Load another SDXL checkpoint's UNet into the warm pipeline in place.
+        
+        The SDXL checkpoints in the registry are UNet fine-tunes over the same
+        base, so text encoders and VAE are kept. Copying in place keeps
+        parameter storage, and with it any compiled graphs, valid.
+        """
+        print(f"🔄 Swapping UNet weights from {model_info['path']}")
+        pipeline = self.loaded_pipeline
+        
+        # Memory-mapped, tensors are only read from disk as they are copied
+        state_dict = load_file(str(self._unet_weights_path(model_info["path"])), device="cpu")
+        unet = getattr(pipeline.unet, "_orig_mod", pipeline.unet)
+        
+        # Validate before copying anything, a failed copy would leave the live
+        # UNet half old and half new
+        if not self._state_dict_matches(unet, state_dict):
+            print("⚠️ UNet checkpoint does not match the loaded architecture, reloading")
+            # Drop local references so load_pipeline can actually free the old model
+            del pipeline, unet, state_dict
+            return self.load_pipeline(model_info)
+        
+        self._copy_state_dict(unet, state_dict)
+        del state_dict
+        if self.qkv_fused:
+            self._refresh_fused_projections(unet)
+        
+        self.current_model = model_info
+        
+        print(f"✅ Successfully swapped to {model_info['path'].name}")
+        return pipeline
+    
+    def _refresh_fused_projections(self, unet: Any) -> None:
+        """Recompute fused Q/K/V weights in place from the freshly loaded projections"""
+        with torch.no_grad():
+            for module in unet.modules():
+                if not getattr(module, "fused_projections", False):
+                    continue
+                
+                if hasattr(module, "to_qkv"):
+                    fused, parts = module.to_qkv, (module.to_q, module.to_k, module.to_v)
+                elif hasattr(module, "to_kv"):
+                    fused, parts = module.to_kv, (module.to_k, module.to_v)
+                else:
+                    continue
+                
+                fused.weight.copy_(torch.cat([part.weight for part in parts]))
+                if fused.bias is not None:
+                    fused.bias.copy_(torch.cat([part.bias for part in parts]))
+    
+    def _unet_weights_path(self, model_path: Path) -> Optional[Path]:
+        """Locate the UNet safetensors file of a diffusers model directory"""
+        variant = "fp16" if self.device != "cpu" else None
+        names = ["diffusion_pytorch_model.safetensors"]
+        if variant:
+            names.insert(0, f"diffusion_pytorch_model.{variant}.safetensors")
+        
+        for name in names:
+            path = model_path / "unet" / name
+            if path.exists():
+                return path
+        return None
+    
+    def _state_dict_matches(self, unet: Any, state_dict: Dict[str, Any]) -> bool:
+        """Check that a checkpoint has exactly the UNet's keys and shapes.
+        
+        Only the fused projections, rebuilt after the copy, may be absent.
+        """
+        targets = unet.state_dict()
+        for name, target in targets.items():
+            if name in state_dict:
+                if state_dict[name].shape != target.shape:
+                    return False
+            elif ".to_qkv." not in name and ".to_kv." not in name:
+                return False
+        return all(name in targets for name in state_dict)
+    
+    def _copy_state_dict(self, unet: Any, state_dict: Dict[str, Any]) -> None:
+        """Copy checkpoint tensors into the UNet's existing parameters.
+        
+        On CUDA each tensor is pinned and copied asynchronously on a side
+        stream, so pinning the next tensor overlaps with the previous transfer.
+        Pinned memory is released every SWAP_STAGING_BYTES to bound host usage.
+        """
+        targets = unet.state_dict()
+        with torch.no_grad():
+            if self.device != "cuda":
+                for name, tensor in state_dict.items():
+                    targets[name].copy_(tensor)
+                return
+            
+            copy_stream = torch.cuda.Stream()
+            copy_stream.wait_stream(torch.cuda.current_stream())
+            staged, staged_bytes = [], 0
+            
+            with torch.cuda.stream(copy_stream):
+                for name, tensor in state_dict.items():
+                    pinned = tensor.pin_memory()
+                    targets[name].copy_(pinned, non_blocking=True)
+                    
+                    # Pinned buffers must outlive their in-flight copies
+                    staged.append(pinned)
+                    staged_bytes += pinned.nbytes
+                    if staged_bytes >= SWAP_STAGING_BYTES:
+                        copy_stream.synchronize()
+                        staged, staged_bytes = [], 0
+            
+            copy_stream.synchronize()
+    
+    def _quantize_unet(self, pipeline: Any) -> None:
+        """Quantize UNet weights to int8 with torchao, leaving the VAE in half precision"""
+        if self.device != "cuda":
+            print(f"⚠️ UNet quantization is only supported on CUDA, skipping on {self.device}")
+            return
+        if self.offloaded:
+            # Offload hooks move the UNet's weights to the CPU between blocks
+            print("⚠️ UNet quantization is not supported with group offloading, skipping")
+            return
+        
+        try:
+            from torchao.quantization import quantize_, int8_weight_only
+            quantize_(pipeline.unet, int8_weight_only())
+            self.quantized = True
+            print("🗜️  Quantized UNet weights to int8")
+        except ImportError:
+            print("⚠️ torchao is not installed, skipping UNet quantization")
+        except Exception as e:
+            print(f"⚠️ Could not quantize UNet: {e}")
+    
+    def _set_attention_processor(self, pipeline: Any) -> None:
+        """Use xFormers when installed, otherwise PyTorch 2 SDPA (FlashAttention on CUDA)"""
+        if XFORMERS_AVAILABLE:
+            try:
+                pipeline.enable_xformers_memory_efficient_attention()
+                self.xformers_enabled = True
+                print("⚡ Using xFormers memory efficient attention")
+                return
+            except Exception as e:
+                print(f"⚠️ Could not enable xFormers: {e}")
+        
+        try:
+            from diffusers.models.attention_processor import AttnProcessor2_0
+            pipeline.unet.set_attn_processor(AttnProcessor2_0())
+        except Exception as e:
+            print(f"⚠️ Could not set SDPA attention processor: {e}")
+    
+    def _compile_pipeline(self, pipeline: Any) -> None:
+        """Compile the UNet and VAE decoder with torch.compile.
+        
+        Q/K/V projections are fused first. If LoRAs are ever loaded with
+        load_lora_weights, follow with pipeline.fuse_lora() before compiling,
+        and call unfuse_lora() / unfuse_qkv_projections() before swapping them.
+        """
+        try:
+            torch.set_float32_matmul_precision("high")
+            torch.backends.cuda.matmul.allow_tf32 = True
+            
+            # One larger GEMM per attention block; xFormers keeps its own processors
+            if not self.xformers_enabled:
+                self._fuse_qkv_projections(pipeline)
+            
+            # One static graph per preset shape instead of falling back to a
+            # dynamic-shape graph once a second resolution is seen
+            torch._dynamo.config.automatic_dynamic_shapes = False
+            torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 32)
+            
+            pipeline.unet = torch.compile(pipeline.unet, mode="reduce-overhead", fullgraph=False)
+            pipeline.vae.decode = torch.compile(pipeline.vae.decode, mode="reduce-overhead")
+            self.compiled = True
+            print("⚡ Compiled UNet and VAE decoder")
+            
+        except Exception as e:
+            print(f"⚠️ Could not compile pipeline: {e}")
+    
+    def _fuse_qkv_projections(self, pipeline: Any) -> None:
+        """Fuse UNet and VAE attention projections, each independently of the other.
+        
+        diffusers raises ValueError for unsupported models (added KV processors,
+        non-AutoencoderKL VAEs); a failed fusion only skips that model, never
+        the compile.
+        """
+        try:
+            pipeline.unet.fuse_qkv_projections()
+        except (AttributeError, ValueError) as e:
+            print(f"⚠️ Could not fuse UNet QKV projections: {e}")
+        
+        # Recorded from the modules themselves, so a partial fusion is still refreshed on swap
+        self.qkv_fused = any(
+            getattr(module, "fused_projections", False) for module in pipeline.unet.modules()
+        )
+        
+        try:
+            pipeline.vae.fuse_qkv_projections()
+        except (AttributeError, ValueError) as e:
+            print(f"⚠️ Could not fuse VAE QKV projections: {e}")
+    
+    def warmup(self, pipeline: Any, presets: List[Dict[str, Any]], max_batch: int = 1) -> None:
+        """Run one-step generations at each preset shape to populate the compile cache.
+        
+        Each preset is warmed for single requests and for the largest batch
+        that fits, up to `max_batch`. Shapes that fail are skipped and compile
+        on first use instead.
+        """
+        if not self.compiled:
+            return
+        
+        for params in presets:
+            width, height = params["width"], params["height"]
+            batch_sizes = sorted({1, self.max_batch_size(params, max_batch)})
+            
+            for batch in batch_sizes:
+                images = batch * params["num_images_per_prompt"]
+                key = (width, height, images, params["guidance_scale"] > 1.0)
+                if key in self.compiled_shapes:
+                    continue
+                
+                print(f"🔥 Warming up {width}x{height} batch {images}")
+                try:
+                    with torch.inference_mode():
+                        pipeline(
+                            prompt=["warmup"] * batch,
+                            num_inference_steps=1,
+                            width=width,
+                            height=height,
+                            num_images_per_prompt=params["num_images_per_prompt"],
+                            guidance_scale=params["guidance_scale"]
+                        )
+                except Exception as e:
+                    reason = "out of memory" if _is_out_of_memory(e) else str(e)
+                    print(f"⚠️ Skipping warmup of {width}x{height} batch {images}: {reason}")
+                    self.free_memory()
+                    # Larger batches of this shape would fail the same way
+                    break
+                self.compiled_shapes.add(key)
+    
+    def release_text_encoders(self, pipeline: Any) -> None:
+        """Drop the text encoders to leave their memory to the UNet"""
+        if pipeline.text_encoder is None:
+            return
+        
+        pipeline.text_encoder = None
+        if hasattr(pipeline, "text_encoder_2"):
+            pipeline.text_encoder_2 = None
+        self.free_memory()
+        print("🧹 Released text encoders")
+    
+    def max_batch_size(self, params: Dict[str, Any], requested: int) -> int:
+        """Largest batch (up to `requested`) whose activations fit in free memory"""
+        if self.device == "cuda":
+            free_bytes, _ = torch.cuda.mem_get_info()
+            free_gb = free_bytes / (1024**3)
+        elif self.device == "mps":
+            # Unified memory - budget what is left after the model weights
+            free_gb = self.system_info["vram_gb"] - self.current_model["vram_required"]
+        else:
+            return 1
+        
+        megapixels = params["width"] * params["height"] / (1024 * 1024)
+        per_image_gb = ACTIVATION_GB_PER_MEGAPIXEL * megapixels * params["num_images_per_prompt"]
+        fits = int(free_gb // per_image_gb)
+        
+        return max(1, min(requested, fits))
+    
+    def free_memory(self) -> None:
+        """Return cached allocator blocks to the device"""
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+        elif self.device == "mps":
+            torch.mps.empty_cache()
+    
+    def set_feature_cache_interval(self, cache_interval: int) -> None:
+        """Configure DeepCache to refresh cached UNet features every N steps"""
+        if self.cache_helper is None:
+            return
+        
+        # The helper can only be disabled after it has been enabled
+        if self.cache_enabled:
+            self.cache_helper.disable()
+            self.cache_enabled = False
+        if cache_interval > 1:
+            self.cache_helper.set_params(cache_interval=cache_interval, cache_branch_id=0)
+            self.cache_helper.enable()
+            self.cache_enabled = True
+    
+    def disable_feature_cache(self) -> None:
+        """Disable and drop the DeepCache helper for the current pipeline"""
+        if self.cache_helper is not None and self.cache_enabled:
+            self.cache_helper.disable()
+        self.cache_helper = None
+        self.cache_enabled = False
+    
+    def _set_optimal_scheduler(self, pipeline: Any, model_info: Dict[str, Any]) -> None:
         """Set optimal scheduler for the model type"""
         try:
-            if model_type == "sdxl":
-                # DPM++ 2M is excellent for SDXL
+            if model_info["path"].name == "sdxl-lightning":
+                # Lightning was distilled for Euler with trailing timesteps
+                pipeline.scheduler = EulerDiscreteScheduler.from_config(
+                    self.base_scheduler_config,
+                    timestep_spacing="trailing"
+                )
+            elif model_info["type"] == "sdxl":
+                # DPM++ 2M SDE Karras converges in ~20 steps on SDXL
                 pipeline.scheduler = DPMSolverMultistepScheduler.from_config(
-                    pipeline.scheduler.config,
+                    self.base_scheduler_config,
                     use_karras_sigmas=True,
-                    algorithm_type="dpmsolver++"
+                    algorithm_type="sde-dpmsolver++",
+                    solver_order=2
                 )
             else:
                 # DDIM for SD1.5
-                pipeline.scheduler = DDIMScheduler.from_config(pipeline.scheduler.config)
+                pipeline.scheduler = DDIMScheduler.from_config(self.base_scheduler_config)
                 
         except Exception as e:
             print(f"⚠️ Could not set optimal scheduler: {e}")
@@ -206,9 +983,26 @@ class ModelManager:
 class EnhancedGenerator:
     """Enhanced image generation with quality optimizations"""
     
-    def __init__(self, models_dir: str):
-        self.model_manager = ModelManager(models_dir)
+    def __init__(
+        self,
+        models_dir: str,
+        generation_only: bool = False,
+        latent_cache: bool = False,
+        quantize: bool = False
+    ):
+        self.model_manager = ModelManager(models_dir, quantize=quantize)
         self.generation_params = self._get_generation_params()
+        self.model_overrides = self._get_model_overrides()
+        self.latent_cache = (
+            LatentCache(self.model_manager.models_dir.parent / "latent_cache") if latent_cache else None
+        )
+        
+        # One-shot runs can release the text encoders once prompts are encoded
+        self.generation_only = generation_only
+        self._prompt_cache: "OrderedDict[Tuple[Any, ...], Dict[str, Any]]" = OrderedDict()
+        
+        # Reused across requests: one latent buffer per shape
+        self._latent_buffers: Dict[Tuple[Any, ...], Any] = {}
     
     def _get_generation_params(self) -> Dict[str, Dict[str, Any]]:
         """Get optimized generation parameters for different quality presets"""
@@ -218,28 +1012,43 @@ class EnhancedGenerator:
                 "guidance_scale": 7.0,
                 "width": 768,
                 "height": 1024,
-                "num_images_per_prompt": 1
+                "num_images_per_prompt": 1,
+                "cache_interval": 5
             },
             "standard": {
-                "num_inference_steps": 25,
+                "num_inference_steps": 20,
                 "guidance_scale": 7.5,
                 "width": 1024,
                 "height": 1024,
-                "num_images_per_prompt": 1
+                "num_images_per_prompt": 1,
+                "cache_interval": 3
             },
             "high_quality": {
-                "num_inference_steps": 30,
+                "num_inference_steps": 22,
                 "guidance_scale": 8.0,
                 "width": 1024,
                 "height": 1344,
-                "num_images_per_prompt": 1
+                "num_images_per_prompt": 1,
+                "cache_interval": 3
             },
             "commercial": {
-                "num_inference_steps": 40,
+                "num_inference_steps": 28,
                 "guidance_scale": 8.5,
                 "width": 1024,
                 "height": 1536,
-                "num_images_per_prompt": 1
+                "num_images_per_prompt": 1,
+                "cache_interval": 2
+            }
+        }
+    
+    def _get_model_overrides(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-model parameter overrides applied on top of any preset"""
+        return {
+            "sdxl-lightning": {
+                # Distilled checkpoint: few steps, no classifier-free guidance
+                "num_inference_steps": 4,
+                "guidance_scale": 1.0,
+                "cache_interval": 1
             }
         }
     
@@ -248,80 +1057,491 @@ class EnhancedGenerator:
         prompt: str,
         negative_prompt: str,
         quality_preset: str = "high_quality",
-        output_path: Optional[str] = None
+        output_path: Optional[str] = None,
+        seed: Optional[int] = None
     ) -> Tuple[str, Dict[str, Any]]:
         """Generate enhanced outfit image"""
+        output_path, metadata, save = self.generate_outfit_images(
+            [prompt], [negative_prompt], quality_preset, [output_path], [seed]
+        )[0]
+        save.result()
+        return output_path, metadata
+    
+    def generate_outfit_images(
+        self,
+        prompts: List[str],
+        negative_prompts: List[str],
+        quality_preset: str = "high_quality",
+        output_paths: Optional[List[Optional[str]]] = None,
+        seeds: Optional[List[Optional[int]]] = None
+    ) -> List[Tuple[str, Dict[str, Any], Future]]:
+        """Generate several outfit images, batching them into as few pipeline calls as fit in memory.
         
-        print(f"🎨 Starting {quality_preset} generation...")
-        start_time = time.time()
+        Each output is (path, metadata, save), where `save` completes once the
+        PNG is on disk.
+        """
+        
+        print(f"🎨 Starting {quality_preset} generation of {len(prompts)} image(s)...")
+        
+        if output_paths is None:
+            output_paths = [None] * len(prompts)
+        
+        # Unseeded images get a random seed so they can be reproduced from metadata
+        seeded = [seed is not None for seed in (seeds or [None] * len(prompts))]
+        seeds = [
+            seed if seed is not None else random.randrange(2**32)
+            for seed in (seeds or [None] * len(prompts))
+        ]
         
         # Get optimal model
         model_info = self.model_manager.get_optimal_model(quality_preset)
         
-        # Load pipeline if needed
+        # Get generation parameters
+        params = {
+            **self.generation_params[quality_preset],
+            **self.model_overrides.get(model_info["path"].name, {})
+        }
+        
+        pipeline = self._ensure_pipeline(model_info)
+        self.model_manager.reconfigure_for_preset(pipeline, model_info, params)
+        
+        batch_size = self.model_manager.max_batch_size(params, len(prompts))
+        print(f"⚙️  Parameters: {params} (batch size {batch_size})")
+        
+        outputs = []
+        for batch_start in range(0, len(prompts), batch_size):
+            batch_end = batch_start + batch_size
+            outputs.extend(self._generate_batch(
+                pipeline,
+                model_info,
+                params,
+                quality_preset,
+                prompts[batch_start:batch_end],
+                negative_prompts[batch_start:batch_end],
+                output_paths[batch_start:batch_end],
+                seeds[batch_start:batch_end],
+                seeded[batch_start:batch_end]
+            ))
+        
+        return outputs
+    
+    def warmup(self, quality_preset: str = "high_quality", max_batch: int = 1) -> None:
+        """Load the model for `quality_preset` and compile every preset shape ahead of requests"""
+        model_info = self.model_manager.get_optimal_model(quality_preset)
+        pipeline = self._ensure_pipeline(model_info)
+        
+        # Warm with this model's overrides, e.g. Lightning runs without CFG
+        overrides = self.model_overrides.get(model_info["path"].name, {})
+        self.model_manager.warmup(
+            pipeline,
+            [{**preset, **overrides} for preset in self.generation_params.values()],
+            max_batch
+        )
+    
+    def _ensure_pipeline(self, model_info: Dict[str, Any]) -> Any:
+        """Make `model_info` the loaded model, swapping the UNet in place when possible"""
         if (self.model_manager.loaded_pipeline is None or 
-            self.model_manager.current_model != model_info):
-            pipeline = self.model_manager.load_pipeline(model_info)
-        else:
-            pipeline = self.model_manager.loaded_pipeline
+            self.model_manager.current_model["path"] != model_info["path"]):
+            if self.model_manager.can_swap_unet(model_info):
+                self.model_manager.swap_unet(model_info)
+            else:
+                self.model_manager.load_pipeline(model_info)
         
-        # Get generation parameters
-        params = self.generation_params[quality_preset]
+        return self.model_manager.loaded_pipeline
+    
+    def _generate_batch(
+        self,
+        pipeline: Any,
+        model_info: Dict[str, Any],
+        params: Dict[str, Any],
+        quality_preset: str,
+        prompts: List[str],
+        negative_prompts: List[str],
+        output_paths: List[Optional[str]],
+        seeds: List[int],
+        seeded: List[bool]
+    ) -> List[Tuple[str, Dict[str, Any], Future]]:
+        """Generate one batch of images in a single pipeline call"""
+        start_time = time.time()
         
-        print(f"📝 Prompt: {prompt[:100]}...")
-        print(f"⚙️  Parameters: {params}")
+        for prompt in prompts:
+            print(f"📝 Prompt: {prompt[:100]}...")
         
         try:
-            # Generate image
-            with torch.inference_mode():
-                result = pipeline(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    **params
+            # Encode each prompt pair once, then stack the embeddings into a batch
+            do_classifier_free_guidance = params["guidance_scale"] > 1.0
+            encoded = [
+                self._encode(pipeline, prompt, negative_prompt, do_classifier_free_guidance)
+                for prompt, negative_prompt in zip(prompts, negative_prompts)
+            ]
+            embeds = {
+                name: torch.cat([item[name] for item in encoded])
+                for name in encoded[0]
+            }
+            
+            if self.generation_only:
+                self.model_manager.release_text_encoders(pipeline)
+            
+            call_kwargs = {**embeds, **_pipeline_kwargs(params)}
+            
+            # Single images can resume from a similar prompt's partially denoised latents
+            skip_steps = 0
+            captured = {}
+            cache_steps = int(params["num_inference_steps"] * LATENT_CACHE_RESUME_FRACTION)
+            use_latent_cache = self.latent_cache is not None and len(prompts) == 1 and cache_steps > 1
+            
+            if use_latent_cache:
+                scope = self._latent_cache_scope(
+                    model_info, quality_preset, params, negative_prompts[0],
+                    seeds[0] if seeded[0] else None
                 )
+                embedding = _prompt_embedding(encoded[0])
+                cached = self.latent_cache.lookup(scope, embedding)
+                
+                if cached is not None:
+                    latents, skip_steps = cached
+                    call_kwargs["latents"] = self._resume_latents(
+                        pipeline, latents, params["num_inference_steps"], skip_steps
+                    )
+                else:
+                    def capture_latents(pipe, step, timestep, callback_kwargs):
+                        if step == cache_steps - 1:
+                            captured["latents"] = callback_kwargs["latents"].clone()
+                        return callback_kwargs
+                    
+                    call_kwargs["callback_on_step_end"] = capture_latents
             
-            # Get the generated image
-            image = result.images[0]
+            # One generator per image, so each image's starting noise and the SDE
+            # scheduler's per-step noise depend only on its own seed
+            generators = self._seeded_generators(pipeline, seeds, params["num_images_per_prompt"])
+            if "latents" not in call_kwargs:
+                call_kwargs["latents"] = self._initial_latents(pipeline, params, generators)
+            call_kwargs["generator"] = generators
             
-            # Save image
-            if output_path is None:
-                timestamp = int(time.time() * 1000)
-                output_path = f"/Users/kaiyakramer/styleagent/generated_outfits/enhanced_outfit_{timestamp}.png"
+            self.model_manager.track_compiled_shape(
+                params["width"], params["height"], len(prompts) * params["num_images_per_prompt"],
+                params["guidance_scale"]
+            )
             
-            # Ensure output directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            # Generate all images of the batch in one forward pass
+            with _skip_first_steps(pipeline.scheduler, skip_steps):
+                result = self._run_pipeline(pipeline, **call_kwargs)
             
-            # Save with high quality
-            image.save(output_path, "PNG", optimize=True, quality=95)
+            if "latents" in captured:
+                self.latent_cache.store(scope, prompts[0], embedding, captured["latents"], cache_steps)
             
             generation_time = time.time() - start_time
+            timestamp = int(time.time() * 1000)
+            outputs = []
             
-            # Generation metadata
-            metadata = {
-                "model_type": model_info["type"],
-                "model_path": str(model_info["path"]),
-                "quality_preset": quality_preset,
-                "generation_time": round(generation_time, 2),
-                "resolution": f"{params['width']}x{params['height']}",
-                "device": self.model_manager.device,
-                "parameters": params,
-                "prompt": prompt,
-                "negative_prompt": negative_prompt
-            }
+            for index, image in enumerate(result.images):
+                prompt = prompts[index]
+                negative_prompt = negative_prompts[index]
+                output_path = output_paths[index]
+                
+                # Save image
+                if output_path is None:
+                    suffix = f"_{index}" if len(prompts) > 1 else ""
+                    output_path = f"/Users/kaiyakramer/styleagent/generated_outfits/enhanced_outfit_{timestamp}{suffix}.png"
+                
+                # Ensure output directory exists
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                
+                # Encode in the background, lossless with fast compression
+                save = _IO_POOL.submit(_save_png, image, output_path)
+                
+                # Generation metadata
+                metadata = {
+                    "model_type": model_info["type"],
+                    "model_path": str(model_info["path"]),
+                    "quality_preset": quality_preset,
+                    "generation_time": round(generation_time, 2),
+                    "batch_size": len(prompts),
+                    "resolution": f"{params['width']}x{params['height']}",
+                    "device": self.model_manager.device,
+                    "parameters": params,
+                    "seed": seeds[index],
+                    "latent_cache_skipped_steps": skip_steps,
+                    "prompt": prompt,
+                    "negative_prompt": negative_prompt
+                }
+                
+                print(f"💾 Saving to: {output_path}")
+                outputs.append((output_path, metadata, save))
             
-            print(f"✅ Generated in {generation_time:.2f}s")
-            print(f"💾 Saved to: {output_path}")
+            print(f"✅ Generated {len(outputs)} image(s) in {generation_time:.2f}s")
             
-            return output_path, metadata
+            return outputs
             
         except Exception as e:
             print(f"❌ Generation failed: {e}")
             raise
 
+    def _initial_latents(self, pipeline: Any, params: Dict[str, Any], generators: List[Any]) -> Any:
+        """Fill a preallocated latent buffer with seeded noise, one generator per image"""
+        device = pipeline._execution_device
+        shape = (
+            len(generators),
+            pipeline.unet.config.in_channels,
+            params["height"] // pipeline.vae_scale_factor,
+            params["width"] // pipeline.vae_scale_factor
+        )
+        key = (shape, str(device), pipeline.unet.dtype)
+        
+        with torch.inference_mode():
+            if key not in self._latent_buffers:
+                self._latent_buffers[key] = torch.empty(shape, device=device, dtype=pipeline.unet.dtype)
+            latents = self._latent_buffers[key]
+            
+            for index, generator in enumerate(generators):
+                latents[index:index + 1].normal_(generator=generator)
+        
+        return latents
+    
+    def _seeded_generators(self, pipeline: Any, seeds: List[int], images_per_prompt: int) -> List[Any]:
+        """One device generator per image; images of the same prompt share their prompt's stream"""
+        device = torch.device(pipeline._execution_device)
+        generators = []
+        for seed in seeds:
+            generator = torch.Generator(device=device).manual_seed(seed)
+            generators.extend([generator] * images_per_prompt)
+        return generators
+    
+    def _latent_cache_scope(
+        self,
+        model_info: Dict[str, Any],
+        quality_preset: str,
+        params: Dict[str, Any],
+        negative_prompt: str,
+        seed: Optional[int]
+    ) -> str:
+        """Settings that must match for cached latents to be reusable.
+        
+        Unseeded requests get random seeds, so they all share one bucket.
+        """
+        return "|".join([
+            model_info["path"].name,
+            quality_preset,
+            f"{params['width']}x{params['height']}",
+            str(params["num_inference_steps"]),
+            str(params["guidance_scale"]),
+            hashlib.sha256(negative_prompt.encode()).hexdigest()[:16],
+            f"seed{seed // LATENT_CACHE_SEED_BUCKET}" if seed is not None else "unseeded"
+        ])
+    
+    def _resume_latents(
+        self,
+        pipeline: Any,
+        latents: Any,
+        num_inference_steps: int,
+        skip_steps: int
+    ) -> Any:
+        """Prepare cached latents to be passed as the pipeline's starting latents.
+        
+        The pipeline scales provided latents by the scheduler's initial noise sigma,
+        which for the truncated schedule is computed here and divided out up front.
+        """
+        device = pipeline._execution_device
+        with _skip_first_steps(pipeline.scheduler, skip_steps):
+            pipeline.scheduler.set_timesteps(num_inference_steps, device=device)
+            init_noise_sigma = pipeline.scheduler.init_noise_sigma
+        
+        return latents.to(device, dtype=pipeline.unet.dtype) / init_noise_sigma
+    
+    def _encode(
+        self,
+        pipeline: Any,
+        prompt: str,
+        negative_prompt: str,
+        do_classifier_free_guidance: bool
+    ) -> Dict[str, Any]:
+        """Encode a prompt pair with the pipeline's text encoders, reusing recent results"""
+        key = (
+            str(self.model_manager.current_model["path"]),
+            prompt,
+            negative_prompt,
+            do_classifier_free_guidance,
+            self.model_manager.device
+        )
+        
+        if key in self._prompt_cache:
+            self._prompt_cache.move_to_end(key)
+            return self._prompt_cache[key]
+        
+        if pipeline.text_encoder is None:
+            raise RuntimeError("Text encoders were released in generation-only mode")
+        
+        with torch.inference_mode():
+            encoded = pipeline.encode_prompt(
+                prompt=prompt,
+                device=pipeline._execution_device,
+                num_images_per_prompt=1,
+                do_classifier_free_guidance=do_classifier_free_guidance,
+                negative_prompt=negative_prompt
+            )
+        
+        # SDXL also returns pooled embeddings, SD1.5 only the sequence embeddings
+        if len(encoded) == 4:
+            names = (
+                "prompt_embeds",
+                "negative_prompt_embeds",
+                "pooled_prompt_embeds",
+                "negative_pooled_prompt_embeds"
+            )
+        else:
+            names = ("prompt_embeds", "negative_prompt_embeds")
+        embeds = {name: tensor for name, tensor in zip(names, encoded) if tensor is not None}
+        
+        self._prompt_cache[key] = embeds
+        if len(self._prompt_cache) > PROMPT_CACHE_SIZE:
+            self._prompt_cache.popitem(last=False)
+        
+        return embeds
+    
+    def _run_pipeline(self, pipeline: Any, **kwargs) -> Any:
+        """Run the pipeline, retrying once with attention slicing on out-of-memory"""
+        try:
+            with torch.inference_mode():
+                return pipeline(**kwargs)
+        except Exception as e:
+            if not _is_out_of_memory(e):
+                raise
+        
+        # Fall back to sliced attention, slower but much lighter on memory
+        print("⚠️ Out of memory - retrying with attention slicing")
+        self.model_manager.free_memory()
+        pipeline.enable_attention_slicing()
+        with torch.inference_mode():
+            return pipeline(**kwargs)
+
+def _emit_result(result: Dict[str, Any]) -> None:
+    """Write one server-mode result as a single marked JSON line.
+    
+    Results are the only writes to the real stdout in server mode (logs are
+    redirected to stderr), so a line from a save thread can't split a log line.
+    """
+    line = f"GENERATION_RESULT_JSON: {json.dumps(result)}\n"
+    with _OUTPUT_LOCK:
+        sys.__stdout__.write(line)
+        sys.__stdout__.flush()
+
+def _emit_when_saved(result: Dict[str, Any], save: Future) -> None:
+    """Emit a result once its image is on disk, or its error if saving failed"""
+    error = save.exception()
+    if error is not None:
+        result = _error_result(error, result.get("id"))
+    _emit_result(result)
+
+def _error_result(error: Exception, request_id: Any = None) -> Dict[str, Any]:
+    """Build the JSON error payload shared by CLI and server mode"""
+    result = {
+        "success": False,
+        "error": str(error),
+        "metadata": {
+            "device": "unknown",
+            "generation_time": 0
+        }
+    }
+    if request_id is not None:
+        result["id"] = request_id
+    return result
+
+def _read_requests(requests: "queue.Queue[Optional[str]]") -> None:
+    """Forward stdin lines to the request queue, then signal EOF with None"""
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            requests.put(line)
+    requests.put(None)
+
+def _serve_batch(generator: EnhancedGenerator, lines: List[str]) -> None:
+    """Run a set of coalesced requests, one pipeline batch per quality preset"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    
+    for line in lines:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            _emit_result(_error_result(ValueError(f"Invalid JSON request: {e}")))
+            continue
+        groups.setdefault(request.get("quality", "high_quality"), []).append(request)
+    
+    for quality_preset, requests in groups.items():
+        try:
+            outputs = generator.generate_outfit_images(
+                prompts=[request["prompt"] for request in requests],
+                negative_prompts=[request.get("negative_prompt", "") for request in requests],
+                quality_preset=quality_preset,
+                output_paths=[request.get("output") for request in requests],
+                seeds=[request.get("seed") for request in requests]
+            )
+        except Exception as e:
+            for request in requests:
+                _emit_result(_error_result(e, request.get("id")))
+            continue
+        
+        # Results go out as their files land, the next batch doesn't wait for them
+        for request, (output_path, metadata, save) in zip(requests, outputs):
+            result = {
+                "id": request.get("id"),
+                "success": True,
+                "output_path": output_path,
+                "metadata": metadata
+            }
+            save.add_done_callback(partial(_emit_when_saved, result))
+
+def serve(generator: EnhancedGenerator, max_batch: int) -> None:
+    """Serve newline-delimited JSON requests from stdin, coalescing them into batches"""
+    # Compile ahead of the first request, so a failed warmup never fails a request
+    try:
+        generator.warmup(max_batch=max_batch)
+    except Exception as e:
+        print(f"⚠️ Warmup failed, shapes will compile on first use: {e}")
+    
+    requests: "queue.Queue[Optional[str]]" = queue.Queue()
+    threading.Thread(target=_read_requests, args=(requests,), daemon=True).start()
+    
+    print(f"🟢 Serving requests (max batch {max_batch})", flush=True)
+    finished = False
+    
+    while not finished:
+        line = requests.get()
+        if line is None:
+            break
+        
+        # Collect whatever else arrives within the batching window
+        lines = [line]
+        deadline = time.time() + SERVE_BATCH_WINDOW
+        while len(lines) < max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                line = requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if line is None:
+                finished = True
+                break
+            lines.append(line)
+        
+        _serve_batch(generator, lines)
+    
+    # Flush results still waiting on their image files
+    _IO_POOL.shutdown(wait=True)
+
+def _batch_output_paths(output: Optional[str], count: int) -> List[Optional[str]]:
+    """Derive one output path per image from the --output argument"""
+    if output is None or count == 1:
+        return [output] * count
+    
+    stem, extension = os.path.splitext(output)
+    return [f"{stem}_{index}{extension}" for index in range(count)]
+
 def main():
     """Main generation function"""
     parser = argparse.ArgumentParser(description="Enhanced Outfit Generator")
-    parser.add_argument("--prompt", required=True, help="Generation prompt")
+    parser.add_argument("--prompt", help="Generation prompt")
     parser.add_argument("--negative-prompt", default="", help="Negative prompt")
     parser.add_argument("--quality", default="high_quality", 
                        choices=["preview", "standard", "high_quality", "commercial"],
@@ -330,20 +1550,54 @@ def main():
     parser.add_argument("--models-dir", 
                        default="/Users/kaiyakramer/styleagent/models/diffusion",
                        help="Models directory")
+    parser.add_argument("--batch", type=int,
+                       help="Images per pipeline call (default 1, or 4 in server mode)")
+    parser.add_argument("--serve", action="store_true",
+                       help="Read JSON requests from stdin and batch them")
+    parser.add_argument("--latent-cache", action="store_true",
+                       help="Resume similar prompts from cached partially denoised latents "
+                            "(faster, but output differs from a fresh run)")
+    parser.add_argument("--seed", type=int,
+                       help="Noise seed (consecutive seeds are used with --batch)")
+    parser.add_argument("--quantize", action="store_true",
+                       help="Quantize UNet weights to int8 (CUDA, requires torchao)")
     
     args = parser.parse_args()
+    if not args.serve and not args.prompt:
+        parser.error("--prompt is required unless --serve is used")
+    
+    if args.serve:
+        # Keep stdout for result lines only, progress logs go to stderr
+        with redirect_stdout(sys.stderr):
+            generator = EnhancedGenerator(
+                args.models_dir,
+                latent_cache=args.latent_cache,
+                quantize=args.quantize
+            )
+            serve(generator, args.batch or 4)
+        return
     
     try:
         # Create generator
-        generator = EnhancedGenerator(args.models_dir)
+        generator = EnhancedGenerator(
+            args.models_dir,
+            generation_only=True,
+            latent_cache=args.latent_cache,
+            quantize=args.quantize
+        )
+        batch = args.batch or 1
         
-        # Generate image
-        output_path, metadata = generator.generate_outfit_image(
-            prompt=args.prompt,
-            negative_prompt=args.negative_prompt,
+        # Generate image(s)
+        outputs = generator.generate_outfit_images(
+            prompts=[args.prompt] * batch,
+            negative_prompts=[args.negative_prompt] * batch,
             quality_preset=args.quality,
-            output_path=args.output
+            output_paths=_batch_output_paths(args.output, batch),
+            seeds=[args.seed + index for index in range(batch)] if args.seed is not None else None
         )
+        for _, _, save in outputs:
+            save.result()
+        output_path, metadata, _ = outputs[0]
         
         # Output result as JSON for Node.js integration
         result = {
@@ -351,6 +1605,8 @@ def main():
             "output_path": output_path,
             "metadata": metadata
         }
+        if batch > 1:
+            result["output_paths"] = [path for path, _, _ in outputs]
         
         print("=" * 50)
         print("GENERATION_RESULT_JSON:")
@@ -358,14 +1614,7 @@ def main():
         
     except Exception as e:
         # Output error as JSON
-        result = {
-            "success": False,
-            "error": str(e),
-            "metadata": {
-                "device": "unknown",
-                "generation_time": 0
-            }
-        }
+        result = _error_result(e)
         
         print("GENERATION_RESULT_JSON:")
         print(json.dumps(result, indent=2))
@@ -2,6 +2,9 @@
 """
 Stable Diffusion Image Generator for StyleAgent
 Handles photo-realistic outfit image generation using diffusers pipeline
+
+Run with `serve` to keep a warm pipeline alive: newline-delimited JSON requests
+are read from stdin and one JSON result per line is written to stdout.
 """
 
 import sys
@@ -18,6 +21,22 @@ except ImportError as e:
     DEPENDENCIES_AVAILABLE = False
     IMPORT_ERROR = str(e)
 
+DEFAULT_MODEL_ID = "runwayml/stable-diffusion-v1-5"
+
+def select_device():
+    """Pick the best available device and matching dtype"""
+    if torch.backends.mps.is_available():
+        return "mps", torch.float16
+    elif torch.cuda.is_available():
+        return "cuda", torch.float16
+    else:
+        return "cpu", torch.float32
+
+def configure_torch():
+    """Process-wide torch settings, applied once at startup"""
+    if torch.cuda.is_available():
+        torch.backends.cudnn.benchmark = True
+
 def test_availability():
     """Test if the Stable Diffusion pipeline is available"""
     if not DEPENDENCIES_AVAILABLE:
@@ -29,12 +48,7 @@ def test_availability():
     
     try:
         # Check device availability
-        if torch.backends.mps.is_available():
-            device = "mps"
-        elif torch.cuda.is_available():
-            device = "cuda"
-        else:
-            device = "cpu"
+        device, _ = select_device()
         
         return {
             "success": True,
@@ -50,50 +64,97 @@ def test_availability():
             "available": False
         }
 
-def generate_image(params):
-    """Generate outfit image using Stable Diffusion"""
-    if not DEPENDENCIES_AVAILABLE:
-        return {
-            "success": False,
-            "error": f"Dependencies not available: {IMPORT_ERROR}"
-        }
+class Worker:
+    """Holds a loaded pipeline so it can be reused across requests"""
     
-    try:
-        start_time = time.time()
+    def __init__(self):
+        self.pipe = None
+        self.pipe_key = None
+    
+    def get_pipeline(self, model_id):
+        """Return a warm pipeline, rebuilding only when model, dtype or device change"""
+        device, torch_dtype = select_device()
+        key = (model_id, str(torch_dtype), device)
         
-        # Determine device
-        if torch.backends.mps.is_available():
-            device = "mps"
-            torch_dtype = torch.float16
-        elif torch.cuda.is_available():
-            device = "cuda"
-            torch_dtype = torch.float16
-        else:
-            device = "cpu"
-            torch_dtype = torch.float32
+        if self.pipe is None or self.pipe_key != key:
+            # Drop the old weights before loading new ones
+            self.pipe = None
+            self.pipe_key = None
+            if device == "cuda":
+                torch.cuda.empty_cache()
+            
+            pipe = StableDiffusionPipeline.from_pretrained(
+                model_id,
+                torch_dtype=torch_dtype,
+                safety_checker=None,
+                requires_safety_checker=False
+            )
+            
+            self.pipe = pipe.to(device)
+            self.pipe_key = key
+        
+        return self.pipe
+    
+    def generate(self, params):
+        """Generate an image, loading the pipeline first if needed"""
+        if not DEPENDENCIES_AVAILABLE:
+            return {
+                "success": False,
+                "error": f"Dependencies not available: {IMPORT_ERROR}"
+            }
         
-        # Create pipeline
-        model_id = params.get("model_id", "runwayml/stable-diffusion-v1-5")
+        try:
+            start_time = time.time()
+            pipe = self.get_pipeline(params.get("model_id", DEFAULT_MODEL_ID))
+            result = generate_image(pipe, params)
+            
+            if result["success"]:
+                result["generation_time"] = round(time.time() - start_time, 2)
+            return result
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "traceback": str(e)
+            }
+    
+    def handle(self, request):
+        """Dispatch a single stdin request to the matching command"""
+        command = request.get("command", "generate")
         
-        pipe = StableDiffusionPipeline.from_pretrained(
-            model_id,
-            torch_dtype=torch_dtype,
-            safety_checker=None,
-            requires_safety_checker=False
-        )
+        if command == "test_availability":
+            result = test_availability()
+        elif command == "generate":
+            result = self.generate(request.get("params", {}))
+        else:
+            result = {
+                "success": False,
+                "error": f"Unknown command: {command}"
+            }
         
-        pipe = pipe.to(device)
+        if "id" in request:
+            result["id"] = request["id"]
+        return result
+
+def generate_image(pipe, params):
+    """Generate outfit image using an already loaded Stable Diffusion pipeline"""
+    try:
+        start_time = time.time()
+        device = pipe.device.type
+        model_id = params.get("model_id", DEFAULT_MODEL_ID)
         
         # Generate image
-        image = pipe(
-            prompt=params["prompt"],
-            negative_prompt=params.get("negative_prompt", ""),
-            height=params.get("height", 512),
-            width=params.get("width", 512),
-            num_inference_steps=params.get("steps", 20),
-            guidance_scale=params.get("guidance_scale", 7.5),
-            generator=torch.Generator(device=device).manual_seed(params.get("seed", -1)) if params.get("seed", -1) >= 0 else None
-        ).images[0]
+        with torch.inference_mode():
+            image = pipe(
+                prompt=params["prompt"],
+                negative_prompt=params.get("negative_prompt", ""),
+                height=params.get("height", 512),
+                width=params.get("width", 512),
+                num_inference_steps=params.get("steps", 20),
+                guidance_scale=params.get("guidance_scale", 7.5),
+                generator=torch.Generator(device=device).manual_seed(params.get("seed", -1)) if params.get("seed", -1) >= 0 else None
+            ).images[0]
         
         # Ensure output directory exists
         output_dir = Path(params.get("output_dir", "./generated_outfits"))
@@ -124,12 +185,35 @@ def generate_image(params):
             "traceback": str(e)
         }
 
+def serve():
+    """Read newline-delimited JSON requests from stdin until EOF"""
+    if DEPENDENCIES_AVAILABLE:
+        configure_torch()
+    worker = Worker()
+    
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            result = {
+                "success": False,
+                "error": f"Invalid JSON request: {str(e)}"
+            }
+        else:
+            result = worker.handle(request)
+        
+        print(json.dumps(result), flush=True)
+
 def main():
     """Main function to handle command line arguments"""
     if len(sys.argv) < 2:
         print(json.dumps({
             "success": False,
-            "error": "No command provided. Use 'test_availability' or 'generate'"
+            "error": "No command provided. Use 'test_availability', 'generate' or 'serve'"
         }))
         sys.exit(1)
     
@@ -139,6 +223,9 @@ def main():
         result = test_availability()
         print(json.dumps(result))
         
+    elif command == "serve":
+        serve()
+        
     elif command == "generate":
         if len(sys.argv) < 3:
             print(json.dumps({
@@ -149,7 +236,9 @@ def main():
         
         try:
             params = json.loads(sys.argv[2])
-            result = generate_image(params)
+            if DEPENDENCIES_AVAILABLE:
+                configure_torch()
+            result = Worker().generate(params)
             print(json.dumps(result))
         except json.JSONDecodeError as e:
             print(json.dumps({
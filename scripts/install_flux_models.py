@@ -8,9 +8,25 @@ import os
 import sys
 import subprocess
 import json
+import hashlib
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
-import time
+
+# Rust-backed chunked downloads, must be configured before huggingface_hub is imported
+try:
+    import hf_transfer  # noqa: F401
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+except ImportError:
+    pass
+
+# Only diffusers-format weights and configs are needed; skip duplicate PyTorch pickles
+DOWNLOAD_PATTERNS = ["*.safetensors", "*.json", "*.txt", "*.model"]
+SKIPPED_PATTERNS = ["*.bin", "*.ckpt", "*.pt"]
+
+# Records checksums already verified so a retry doesn't rehash completed files
+VERIFIED_MANIFEST = ".verified.json"
 
 def check_requirements():
     """Check if required packages are installed"""
@@ -19,11 +35,18 @@ def check_requirements():
         import diffusers
         import transformers
         import huggingface_hub
-        print("✅ All required packages are installed")
-        return True
     except ImportError as e:
         print(f"❌ Missing package: {e}")
         return False
+    
+    # Older releases may symlink local_dir files into the shared cache
+    hub_version = tuple(int(part) for part in huggingface_hub.__version__.split(".")[:2])
+    if hub_version < (0, 23):
+        print(f"❌ huggingface-hub {huggingface_hub.__version__} is too old, 0.23.0 or newer is required")
+        return False
+    
+    print("✅ All required packages are installed")
+    return True
 
 def install_requirements():
     """Install required packages"""
@@ -32,7 +55,8 @@ def install_requirements():
         "torch>=2.0.0",
         "diffusers>=0.30.0", 
         "transformers>=4.40.0",
-        "huggingface-hub>=0.20.0",
+        "huggingface-hub>=0.23.0",
+        "hf_transfer>=0.1.4",
         "accelerate>=0.26.0",
         "safetensors>=0.4.0",
         "Pillow>=9.0.0",
@@ -83,32 +107,98 @@ def get_system_info():
         print(f"❌ Error getting system info: {e}")
         return None
 
+def _wanted(filename):
+    """Check whether a repository file matches the download patterns"""
+    return (any(fnmatch(filename, pattern) for pattern in DOWNLOAD_PATTERNS) and
+            not any(fnmatch(filename, pattern) for pattern in SKIPPED_PATTERNS))
+
+def _sha256(path):
+    """Hash a file in 8MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def verify_download(model_id, local_dir):
+    """Compare downloaded LFS files against their Hub sha256, returning the mismatches"""
+    from huggingface_hub import HfApi
+    
+    manifest_path = os.path.join(local_dir, VERIFIED_MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    
+    info = HfApi().model_info(model_id, files_metadata=True)
+    mismatched = []
+    
+    for sibling in info.siblings:
+        if sibling.lfs is None or not _wanted(sibling.rfilename):
+            continue
+        
+        path = os.path.join(local_dir, sibling.rfilename)
+        if not os.path.exists(path):
+            mismatched.append(sibling.rfilename)
+            continue
+        
+        stat = os.stat(path)
+        known = manifest.get(sibling.rfilename)
+        if (known and known["sha256"] == sibling.lfs.sha256 and
+                known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns):
+            continue
+        
+        if _sha256(path) == sibling.lfs.sha256:
+            manifest[sibling.rfilename] = {
+                "sha256": sibling.lfs.sha256,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns
+            }
+        else:
+            mismatched.append(sibling.rfilename)
+    
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    
+    return mismatched
+
 def download_model(model_id, local_dir, description=""):
     """Download a model from Hugging Face"""
     try:
+        from huggingface_hub import snapshot_download, hf_hub_download
+        
         print(f"📥 Downloading {description or model_id}...")
         
         # Create directory if it doesn't exist
         os.makedirs(local_dir, exist_ok=True)
         
-        # Use huggingface-cli for reliable downloads
-        cmd = [
-            "huggingface-cli", "download", 
-            model_id,
-            "--local-dir", local_dir,
-            "--local-dir-use-symlinks", "False"
-        ]
+        # Fetch the repository files in parallel; huggingface_hub resumes partial files itself
+        snapshot_download(
+            repo_id=model_id,
+            local_dir=local_dir,
+            max_workers=8,
+            allow_patterns=DOWNLOAD_PATTERNS,
+            ignore_patterns=SKIPPED_PATTERNS
+        )
         
-        # Execute download
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # Refetch only the files whose checksum doesn't match
+        mismatched = verify_download(model_id, local_dir)
+        for filename in mismatched:
+            print(f"🔁 Checksum mismatch, redownloading {filename}")
+            hf_hub_download(
+                repo_id=model_id,
+                filename=filename,
+                local_dir=local_dir,
+                force_download=True
+            )
         
-        if result.returncode == 0:
-            print(f"✅ Successfully downloaded {description or model_id}")
-            return True
-        else:
-            print(f"❌ Failed to download {model_id}")
-            print(f"Error: {result.stderr}")
+        if mismatched and verify_download(model_id, local_dir):
+            print(f"❌ Checksum verification failed for {model_id}")
             return False
+        
+        print(f"✅ Successfully downloaded {description or model_id}")
+        return True
             
     except Exception as e:
         print(f"❌ Error downloading {model_id}: {e}")
@@ -153,13 +243,14 @@ def download_flux_models(models_dir, system_info):
         }
     ])
     
-    # Download models
-    success_count = 0
-    for model in models_to_download:
-        if download_model(model["id"], model["dir"], model["description"]):
-            success_count += 1
-        time.sleep(1)  # Brief pause between downloads
+    # Download models, two at a time
+    def _download(model):
+        return download_model(model["id"], model["dir"], model["description"])
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(_download, models_to_download))
     
+    success_count = sum(results)
     return success_count, len(models_to_download)
 
 def create_model_config(models_dir, system_info):
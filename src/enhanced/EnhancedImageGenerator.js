@@ -14,6 +14,11 @@ export class EnhancedImageGenerator {
     this.pythonVenvPath = '/Users/kaiyakramer/styleagent/stable-diffusion-webui/venv/bin/python';
     this.generatorScriptPath = '/Users/kaiyakramer/styleagent/scripts/enhanced_outfit_generator.py';
     this.modelsDir = '/Users/kaiyakramer/styleagent/models/diffusion';
+
+    // Persistent Python server, started on first use so requests can be batched
+    this.server = null;
+    this.pendingRequests = new Map();
+    this.nextRequestId = 1;
   }
 
   /**
@@ -26,7 +31,8 @@ export class EnhancedImageGenerator {
       styleDNA = null,
       gender = null,
       style = 'fashion_photography',
-      outputPath = null
+      outputPath = null,
+      seed = null
     } = options;
 
     try {
@@ -51,7 +57,8 @@ export class EnhancedImageGenerator {
         prompt: promptData.prompt,
         negativePrompt: promptData.negative_prompt,
         qualityPreset,
-        outputPath
+        outputPath,
+        seed
       });
 
       if (result.success) {
@@ -92,31 +99,29 @@ export class EnhancedImageGenerator {
       variations = ['fashion_photography', 'editorial', 'commercial']
     } = options;
 
-    const results = [];
+    // Submit all variations at once so the Python server can batch them
+    const requests = [];
 
     for (let i = 0; i < count; i++) {
       const style = variations[i % variations.length];
       console.log(`🎨 Generating variation ${i + 1}/${count} (${style})`);
 
-      const result = await this.generateOutfitImage(clothingItems, {
-        ...options,
-        qualityPreset,
-        style,
-        outputPath: null // Auto-generate unique paths
-      });
-
-      results.push({
-        ...result,
-        variation_index: i,
-        style
-      });
-
-      // Brief pause between generations
-      if (i < count - 1) {
-        await new Promise(resolve => setTimeout(resolve, 1000));
-      }
+      requests.push(
+        this.generateOutfitImage(clothingItems, {
+          ...options,
+          qualityPreset,
+          style,
+          outputPath: null // Auto-generate unique paths
+        }).then(result => ({
+          ...result,
+          variation_index: i,
+          style
+        }))
+      );
     }
 
+    const results = await Promise.all(requests);
+
     return results;
   }
 
@@ -145,64 +150,153 @@ export class EnhancedImageGenerator {
   /**
    * Call the enhanced Python generator
    */
-  async callPythonGenerator({ prompt, negativePrompt, qualityPreset, outputPath }) {
+  async callPythonGenerator({ prompt, negativePrompt, qualityPreset, outputPath, seed = null }) {
+    const server = this.startServer();
+    const id = this.nextRequestId++;
+
     return new Promise((resolve, reject) => {
-      const args = [
-        this.generatorScriptPath,
-        '--prompt', prompt,
-        '--negative-prompt', negativePrompt,
-        '--quality', qualityPreset,
-        '--models-dir', this.modelsDir
-      ];
-
-      if (outputPath) {
-        args.push('--output', outputPath);
-      }
+      this.pendingRequests.set(id, { resolve, reject });
+      this.updateServerRef();
+      server.stdin.write(JSON.stringify({
+        id,
+        prompt,
+        negative_prompt: negativePrompt,
+        quality: qualityPreset,
+        output: outputPath,
+        seed
+      }) + '\n');
+    });
+  }
 
-      console.log('🐍 Calling Python generator...');
-      
-      const pythonProcess = spawn(this.pythonVenvPath, args);
-      
-      let output = '';
-      let error = '';
-      let generationResult = null;
+  /**
+   * Start the Python generator in server mode if it is not already running.
+   * The server keeps the pipeline loaded and batches concurrent requests.
+   */
+  startServer() {
+    if (this.server) {
+      return this.server;
+    }
 
-      pythonProcess.stdout.on('data', (data) => {
-        const dataStr = data.toString();
-        output += dataStr;
-        
-        // Look for generation result JSON
-        if (dataStr.includes('GENERATION_RESULT_JSON:')) {
-          try {
-            const jsonStart = dataStr.indexOf('GENERATION_RESULT_JSON:') + 'GENERATION_RESULT_JSON:'.length;
-            const jsonStr = dataStr.substring(jsonStart).trim();
-            generationResult = JSON.parse(jsonStr);
-          } catch (e) {
-            console.warn('⚠️ Could not parse generation result JSON');
-          }
-        }
-        
-        // Log progress
-        console.log(dataStr.trim());
-      });
+    const args = [
+      this.generatorScriptPath,
+      '--serve',
+      '--models-dir', this.modelsDir
+    ];
 
-      pythonProcess.stderr.on('data', (data) => {
-        error += data.toString();
-        console.error('Python stderr:', data.toString());
-      });
+    console.log('🐍 Starting Python generator server...');
+
+    const server = spawn(this.pythonVenvPath, args);
+    let stdoutBuffer = '';
+    let error = '';
 
-      pythonProcess.on('close', (code) => {
-        if (code === 0 && generationResult) {
-          resolve(generationResult);
-        } else {
-          reject(new Error(`Python process failed with code ${code}: ${error}`));
+    server.stdout.on('data', (data) => {
+      stdoutBuffer += data.toString();
+
+      let newlineIndex;
+      while ((newlineIndex = stdoutBuffer.indexOf('\n')) !== -1) {
+        const line = stdoutBuffer.slice(0, newlineIndex).trim();
+        stdoutBuffer = stdoutBuffer.slice(newlineIndex + 1);
+        if (line) {
+          this.handleServerLine(line);
         }
-      });
+      }
+    });
 
-      pythonProcess.on('error', (err) => {
-        reject(new Error(`Failed to start Python process: ${err.message}`));
-      });
+    // In server mode stdout only carries result lines, progress logs arrive on stderr
+    server.stderr.on('data', (data) => {
+      error = (error + data.toString()).slice(-4000);
+      process.stderr.write(data);
+    });
+
+    // Writing to a server that already exited fails with EPIPE
+    server.stdin.on('error', (err) => {
+      this.failPendingRequests(new Error(`Python server stdin failed: ${err.message}`));
     });
+
+    server.on('close', (code) => {
+      this.failPendingRequests(new Error(`Python process failed with code ${code}: ${error}`));
+      if (this.server === server) {
+        this.server = null;
+      }
+    });
+
+    server.on('error', (err) => {
+      this.failPendingRequests(new Error(`Failed to start Python process: ${err.message}`));
+      if (this.server === server) {
+        this.server = null;
+      }
+    });
+
+    this.server = server;
+    this.updateServerRef();
+    return server;
+  }
+
+  /**
+   * Keep Node alive for the idle server only while requests are in flight,
+   * so scripts exit once their last generation resolves
+   */
+  updateServerRef() {
+    if (!this.server) {
+      return;
+    }
+
+    const method = this.pendingRequests.size > 0 ? 'ref' : 'unref';
+    for (const handle of [this.server, this.server.stdin, this.server.stdout, this.server.stderr]) {
+      handle?.[method]?.();
+    }
+  }
+
+  /**
+   * Resolve a pending request from a server result line, log anything else
+   */
+  handleServerLine(line) {
+    const marker = 'GENERATION_RESULT_JSON:';
+
+    if (!line.startsWith(marker)) {
+      // Log progress
+      console.log(line);
+      return;
+    }
+
+    let generationResult;
+    try {
+      generationResult = JSON.parse(line.substring(marker.length).trim());
+    } catch (e) {
+      console.warn('⚠️ Could not parse generation result JSON');
+      return;
+    }
+
+    const pending = this.pendingRequests.get(generationResult.id);
+    if (!pending) {
+      return;
+    }
+
+    this.pendingRequests.delete(generationResult.id);
+    this.updateServerRef();
+    delete generationResult.id;
+    pending.resolve(generationResult);
+  }
+
+  /**
+   * Reject every request still waiting on the server
+   */
+  failPendingRequests(error) {
+    for (const { reject } of this.pendingRequests.values()) {
+      reject(error);
+    }
+    this.pendingRequests.clear();
+    this.updateServerRef();
+  }
+
+  /**
+   * Stop the Python server and release the loaded pipeline
+   */
+  shutdown() {
+    if (this.server) {
+      this.server.stdin.end();
+      this.server = null;
+    }
   }
 
   /**
@@ -237,6 +331,15 @@ export class EnhancedImageGenerator {
         outputPath: '/tmp/test_capabilities.png'
       });
 
+      if (!result.success) {
+        return {
+          device: result.metadata?.device || 'unknown',
+          available: false,
+          error: result.error,
+          models_available: await this.checkModelAvailability()
+        };
+      }
+
       return {
         device: result.metadata?.device || 'unknown',
         available: true,
@@ -294,9 +397,9 @@ export class EnhancedImageGenerator {
  */
 export const QUALITY_PRESETS = {
   PREVIEW: 'preview',        // Fast preview (15 steps, 768x1024)
-  STANDARD: 'standard',      // Balanced quality (25 steps, 1024x1024)
-  HIGH_QUALITY: 'high_quality', // High quality (30 steps, 1024x1344)
-  COMMERCIAL: 'commercial'   // Commercial grade (40 steps, 1024x1536)
+  STANDARD: 'standard',      // Balanced quality (20 steps, 1024x1024)
+  HIGH_QUALITY: 'high_quality', // High quality (22 steps, 1024x1344)
+  COMMERCIAL: 'commercial'   // Commercial grade (28 steps, 1024x1536)
 };
 
 /**
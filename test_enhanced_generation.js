@@ -108,6 +108,9 @@ async function testEnhancedGeneration() {
     console.log('💡 This might be normal if models are still downloading.');
     console.log('   Check download progress with:');
     console.log('   tail -f stable-diffusion-webui/juggernaut_download.log');
+  } finally {
+    // Stop the Python server so the test process can exit
+    generator.shutdown();
   }
 }
 